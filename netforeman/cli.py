@@ -40,28 +40,67 @@ __all__ = [ 'main' ]
 DEFAULT_LOG_LEVEL = logging.INFO
 """Default level for the root logger."""
 
+LOG_FORMAT = "%(name)s: %(levelname)s: %(message)s"
+"""Log format for normal operation."""
 
-def create_logger():
-    """Set up logging and return a logger object."""
+DEBUG_LOG_FORMAT = "%(asctime)s " + LOG_FORMAT
+"""Log format for debug mode. Timestamps are costly, so only used here."""
+
+
+_stderr_handler = None
+"""Handler added by create_logger, if any."""
+
+
+def create_logger(debug=False):
+    """Set up logging and return a logger object.
+
+    If debug is True, sets the root logger to DEBUG level and includes
+    timestamps in the output. A stderr handler is only added if the root
+    logger has none yet; handlers installed by someone else are left
+    alone.
+
+    """
+    global _stderr_handler
+
+    logger = logging.getLogger('netforeman')
 
     root_logger = logging.getLogger()
-    root_logger.setLevel(DEFAULT_LOG_LEVEL)
+    root_logger.setLevel(logging.DEBUG if debug else DEFAULT_LOG_LEVEL)
 
-    stderr = logging.StreamHandler()
-    stderr.setLevel(logging.DEBUG)
-    stderr.setFormatter(logging.Formatter("%(asctime)s %(name)s: %(levelname)s: %(message)s"))
+    if _stderr_handler is None:
+        if root_logger.handlers:
+            return logger
 
-    root_logger.addHandler(stderr)
+        _stderr_handler = logging.StreamHandler()
+        _stderr_handler.setLevel(logging.DEBUG)
+        root_logger.addHandler(_stderr_handler)
 
-    return logging.getLogger('netforeman')
+    _stderr_handler.setFormatter(logging.Formatter(DEBUG_LOG_FORMAT if debug else LOG_FORMAT))
 
+    return logger
 
-def parse_args():
-    """Parse command-line arguments.
 
-    Returns a populated namespace with all arguments and their values.
+_parser = None
+"""Cached argument parser, see _get_parser."""
+
+
+def _get_parser():
+    """Get the command-line argument parser.
+
+    The parser is only built once per process.
 
     """
+    global _parser
+
+    if _parser is None:
+        _parser = _build_parser()
+
+    return _parser
+
+
+def _build_parser():
+    """Build the command-line argument parser."""
+
     parser = argparse.ArgumentParser(
             description="Making sure your network is running smoothly.")
 
@@ -74,24 +113,28 @@ def parse_args():
     parser.add_argument('config_file', metavar='CONFIG-FILE',
             help='configuration file')
 
-    args = parser.parse_args()
+    return parser
 
-    return args
+
+def parse_args():
+    """Parse command-line arguments.
+
+    Returns a populated namespace with all arguments and their values.
+
+    """
+    return _get_parser().parse_args()
 
 def main():
     """Main program function."""
 
-    logger = create_logger()
-
     args = parse_args()
 
-    if args.debug:
-        logging.getLogger().setLevel(logging.DEBUG)
+    logger = create_logger(args.debug)
 
     try:
         dispatcher = dispatch.Dispatch(args.config_file)
     except dispatch.DispatchError as e:
-        logger.error("aborting: %s", str(e))
+        logger.error("aborting: %s", e)
         return 1
 
     status = dispatcher.run()
@@ -99,7 +142,7 @@ def main():
     if status == moduleapi.ModuleRunStatus.ok:
         logger.info("all done, terminating...")
     elif status == moduleapi.ModuleRunStatus.check_failed:
-        logger.warn("check(s) failed, all actions executed successfully")
+        logger.warning("check(s) failed, all actions executed successfully")
     elif status == moduleapi.ModuleRunStatus.action_error:
         logger.error("check(s) failed, at least one action had an error")
     else:
@@ -26,12 +26,67 @@
 import abc
 import logging
 import importlib
+import functools
+import os
 
-import pyhocon
+
+_config_logger = logging.getLogger('netforeman.config')
+_settings_logger = logging.getLogger('netforeman.settings')
+
+
+@functools.lru_cache(maxsize=1)
+def _get_pyhocon():
+    """Import and return the pyhocon module.
+
+    pyhocon is slow to import, and only needed when actually parsing a
+    configuration file. Importing it lazily keeps it off the startup path
+    of anything that merely imports this module.
+
+    """
+    import pyhocon
+    import pyhocon.exceptions
+
+    return pyhocon
+
+
+_READ_BUFSIZE = 1 << 20
+"""Buffer size for reading configuration files."""
+
+
+def _parse(filename):
+    """Parse a configuration file.
+
+    Reads the whole file with a single buffered read, and parses it from
+    memory. Returns a pyhocon.config_tree.ConfigTree. Raises OSError if
+    the file can't be read, or pyhocon.exceptions.ConfigException if it
+    can't be parsed.
+
+    """
+    with open(filename, 'rb', buffering=_READ_BUFSIZE) as f:
+        content = f.read().decode('utf-8')
+
+    # basedir is needed to resolve relative includes
+    return _get_pyhocon().ConfigFactory.parse_string(content,
+                                                     os.path.dirname(filename))
+
+
+_MODULES_PREFIX = __package__ + ".modules."
+"""Package prefix for NetForeman modules."""
+
+
+@functools.lru_cache(maxsize=None)
+def _import_module(name):
+    """Import a NetForeman module by name, caching the result."""
+    return importlib.import_module(_MODULES_PREFIX + name)
+
+
+_LOADING = object()
+"""Placeholder for a module whose API class is still being loaded."""
 
 
 class ConfigError(Exception):
     """Error while parsing configuration."""
+
     def __init__(self, message):
         self.message = message
 
@@ -80,7 +135,7 @@ class Settings(metaclass=abc.ABCMeta):
         attributes such as logging.
 
         """
-        self.logger = logging.getLogger('netforeman.settings')
+        self.logger = _settings_logger
 
     @classmethod
     @abc.abstractmethod
@@ -115,13 +170,19 @@ class Configurator:
         """
         self.filename = filename
 
-        self.logger = logging.getLogger('netforeman.config')
+        self.logger = _config_logger
         self.logger.debug("reading configuration file '%s'", filename)
 
+        pyhocon = _get_pyhocon()
+
         try:
-            self.conf = pyhocon.ConfigFactory.parse_file(filename)
+            self.conf = _parse(filename)
         except pyhocon.exceptions.ConfigException as e:
             raise ConfigError(str(e))
+        except OSError as e:
+            raise ConfigError("unable to read configuration file: {!s}".format(e))
+        except UnicodeDecodeError as e:
+            raise ConfigError("invalid UTF-8 in configuration file: {!s}".format(e))
 
         self.logger.debug("finished reading configuration file")
 
@@ -131,6 +192,8 @@ class Configurator:
         Returns True if all modules loaded without error, False otherwise.
 
         """
+        pyhocon = _get_pyhocon()
+
         try:
             modules_to_load = self.conf['modules']
         except pyhocon.exceptions.ConfigMissingException as e:
@@ -139,6 +202,9 @@ class Configurator:
 
         errors = False
 
+        # checked once, rather than by each debug() call in the loop
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+
         # useful to run the APIs in the order they were declared
         self.loaded_apis = []
 
@@ -150,17 +216,23 @@ class Configurator:
         self.module_apis_by_name = {}
 
         for name in modules_to_load:
-            if name in self.module_api_classes_by_name:
+            # reserve the name; a single dict operation for the common case
+            prev = self.module_api_classes_by_name.setdefault(name, _LOADING)
+            if prev is not _LOADING:
                 self.logger.warning("ignoring duplicate entry for module '%s', already loaded", name)
                 continue
 
-            self.logger.debug("loading module '%s'", name)
+            if debug:
+                self.logger.debug("loading module '%s'", name)
 
             try:
-                if name not in self.conf:
-                    raise ConfigError("missing required section '{:s}'".format(module_name))
-
-                config_tree = self.conf.get_config(name)
+                try:
+                    config_tree = self.conf.get_config(name)
+                except pyhocon.exceptions.ConfigMissingException:
+                    raise ConfigError("missing required section '{:s}'".format(name))
+                except pyhocon.exceptions.ConfigException:
+                    # e.g. not an object; type exceptions vary by version
+                    raise ConfigError("section '{:s}' must be an object".format(name))
 
                 API = self._get_module_api(name)
                 self.module_api_classes_by_name[name] = API
@@ -174,8 +246,9 @@ class Configurator:
                 self.module_apis_by_name[name] = api
                 self.loaded_apis.append(api)
             except ConfigError as e:
-                self.logger.error("module '%s': %s", name, str(e))
+                self.logger.error("module '%s': %s", name, e)
                 errors = True
+                del self.module_api_classes_by_name[name]
 
         return not errors
 
@@ -187,9 +260,7 @@ class Configurator:
         moduleapi.ModuleAPI.
 
         """
-        module = importlib.import_module("{:s}.modules.{:s}".format(__package__, name))
-
-        return module.API
+        return _import_module(name).API
 
     def resolve_action(self, action_name):
         """Resolve an action by name.
@@ -207,7 +278,7 @@ class Configurator:
         Raises ConfigError in case of error (e.g. action not found).
 
         """
-        module_name, _, action_basename = action_name.rpartition('.')
+        sep = action_name.rfind('.')
 
         # We don't allow relative names; it would be too complicated for
         # cases like linuxfib, which inherits almost everything from
@@ -217,23 +288,26 @@ class Configurator:
         # linuxfib just for this, or having to pass around the module name
         # in *every* configurable object. Not worth it.
 
-        if not module_name:
+        # sep is -1 if there's no dot, 0 if the module name is empty
+        if sep <= 0:
             raise ConfigError("missing module name in action definition {:s}".format(action_name))
 
-        if not action_basename:
+        if sep == len(action_name) - 1:
             raise ConfigError("missing action name in action definition {:s}".format(action_name))
 
+        module_name = action_name[:sep]
+        action_basename = action_name[sep+1:]
+
         try:
             # load from the class, as the API may not be instantiated yet
             api_class = self.module_api_classes_by_name[module_name]
         except KeyError:
             raise ConfigError("no such module '{:s}' in action definition".format(module_name))
 
-        if action_basename not in api_class.actions:
+        action_class = api_class.actions.get(action_basename)
+        if action_class is None:
             raise ConfigError("action '{:s}' not defined in module '{:s}'".format(action_name, module_name))
 
-        action_class = api_class.actions[action_basename]
-
         api = self.module_apis_by_name.get(module_name, None)
 
         return (action_class, api)
@@ -252,7 +326,8 @@ class Configurator:
 
         action_class = self.resolve_action(action_name)[0]
 
-        self.logger.debug("configuring action %s", action_name)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("configuring action %s", action_name)
 
         return action_class.settings_from_pyhocon(conf, self)
 
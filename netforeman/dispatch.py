@@ -31,11 +31,6 @@ from netforeman import moduleapi
 
 class DispatchError(Exception):
     """Error while dispatching."""
-    def __init__(self, message):
-        self.message = message
-
-    def __str__(self):
-        return self.message
 
 
 class Dispatch:
@@ -55,6 +50,22 @@ class Dispatch:
         if not ok:
             raise DispatchError("errors while loading modules")
 
+        self._action_table = self._build_action_table()
+
+    def _build_action_table(self):
+        """Build the table of all actions of all loaded modules.
+
+        Returns a dict mapping absolute action names (e.g.
+        "email.sendmail") to (action_class, api) tuples, so actions can be
+        resolved with a single lookup at execution time.
+
+        """
+        return {
+            name + '.' + action_basename: (action_class, api)
+            for name, api in self.config.module_apis_by_name.items()
+            for action_basename, action_class in api.actions.items()
+        }
+
     def run(self):
         """Run module behavior.
 
@@ -63,13 +74,26 @@ class Dispatch:
         """
 
         status = moduleapi.ModuleRunStatus.ok
+        logger = self.logger
+        debug = logger.isEnabledFor(logging.DEBUG)
+
         for api in self.config.loaded_apis:
-            self.logger.debug("running module %s", api.name)
+            if debug:
+                logger.debug("running module %s", api.name)
 
             substatus = api.run(self)
 
-            self.logger.debug("module %s returned %s", api.name, substatus.name)
-            status = max(status, substatus)
+            if debug:
+                logger.debug("module %s returned %s", api.name, substatus.name)
+            if substatus > status:
+                status = substatus
+
+        # modules may have deferred work for after all modules have run
+        # (e.g. batched emails)
+        for api in self.config.loaded_apis:
+            substatus = api.flush(self)
+            if substatus > status:
+                status = substatus
 
         return status
 
@@ -80,15 +104,18 @@ class Dispatch:
         ActionContext.
 
         """
-        action_name = settings.action_name
+        action = settings._action
+        if action is None:
+            action_name = settings.action_name
 
-        action_class, api = self.config.resolve_action(action_name)
+            try:
+                action_class, api = self._action_table[action_name]
+            except KeyError:
+                # should never happen, actions are resolved when configured
+                raise DispatchError("no such action '{:s}'".format(action_name))
 
-        # api should only be None if the module isn't loaded, in which case
-        # we shouldn't have gotten here
-        assert api is not None
+            action = settings._action = action_class(api, settings)
 
-        action = action_class(api, settings)
         action.execute(context)
 
 
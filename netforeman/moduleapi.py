@@ -26,10 +26,22 @@
 import logging
 import abc
 import enum
+import functools
 
 from netforeman import config
 
 
+@functools.lru_cache(maxsize=None)
+def _module_basename(module_name):
+    """Get the basename of a module, given its full name.
+
+    Cached, as ModuleAPI.name is used for logging and in every
+    ActionContext.
+
+    """
+    return module_name.rpartition('.')[2]
+
+
 class ActionContext:
     """Context information for an action.
 
@@ -51,6 +63,9 @@ class ActionSettings(config.Settings, metaclass=abc.ABCMeta):
     attribute, action_name. This MUST hold the full (absolute) name of the
     action, for resolving at execution time.
 
+    The _action attribute is reserved for use by Dispatch, which caches
+    the action's Action instance there.
+
     """
 
     @abc.abstractmethod
@@ -65,6 +80,7 @@ class ActionSettings(config.Settings, metaclass=abc.ABCMeta):
         """
         super().__init__()
         self.action_name = action_name
+        self._action = None
 
 
 class ActionListSettings(config.Settings):
@@ -131,6 +147,10 @@ class Action(config.Configurable, metaclass=abc.ABCMeta):
     be the appropriate subclass of config.Settings for that action. This
     will be used by config.Configurable.settings_from_pyhocon.
 
+    Dispatch creates a single Action instance per ActionSettings and
+    reuses it for every execution. Subclasses MUST NOT keep state between
+    calls to execute.
+
     """
 
     def __init__(self, module, settings):
@@ -214,7 +234,7 @@ class ModuleAPI(config.Configurable, metaclass=abc.ABCMeta):
         This is the module's basename, as used for importing.
 
         """
-        return self.__module__.rpartition('.')[2]
+        return _module_basename(self.__module__)
 
     # This method need not be overriden if the module doesn't do anything
     # by itself (e.g. it only exists to provide callable actions).
@@ -232,4 +252,14 @@ class ModuleAPI(config.Configurable, metaclass=abc.ABCMeta):
         """
         return ModuleRunStatus.ok
 
+    # Like run, this need only be overriden by modules that defer work.
+    def flush(self, dispatch):
+        """Complete any work deferred while running the modules.
+
+        Called by the dispatch after all modules have run. Returns a
+        ModuleRunStatus.
+
+        """
+        return ModuleRunStatus.ok
+
 # vim: set expandtab smarttab shiftwidth=4 softtabstop=4 tw=75 :
@@ -25,6 +25,9 @@
 
 
 import abc
+import itertools
+import logging
+import socket
 import netaddr
 
 from netforeman import moduleapi
@@ -67,9 +70,25 @@ class FIBInterface:
         pass
 
     def get_routes(self, family):
-        """Get routes from the underlying FIB."""
+        """Get routes from the underlying FIB.
+
+        Returns an iterable of route.Route. Subclasses may return an
+        iterator, so callers should not rely on iterating more than once.
+
+        """
         raise NotImplementedError()
 
+    def get_routes_both(self):
+        """Get both IPv4 and IPv6 routes from the underlying FIB.
+
+        Returns an iterable of route.Route, with the IPv4 routes followed
+        by the IPv6 routes. Subclasses may override this to fetch both
+        families more efficiently.
+
+        """
+        return itertools.chain(self.get_routes(socket.AF_INET),
+                               self.get_routes(socket.AF_INET6))
+
     def add_route(self, r):
         """Add a route to the FIB.
 
@@ -233,10 +252,14 @@ class RouteCheckSettings(config.Settings):
             non_null = True
 
         self.rm = route.RouteMatch(dest=dest)
+        self.dest_str = str(self.rm.dest)
         self.on_error = on_error
         self.non_null = non_null
         self.nexthops_any = nexthops_any if nexthops_any is not None else []
 
+        # for membership tests; nexthops_any keeps the configured order
+        self.nexthops_any_set = frozenset(self.nexthops_any)
+
     @classmethod
     def from_pyhocon(cls, conf, configurator):
         """Create RouteCheckSettings from a pyhocon ConfigTree.
@@ -334,11 +357,11 @@ class FIBModuleAPI(moduleapi.ModuleAPI, metaclass=abc.ABCMeta):
         Returns True if all actions succeed, False otherwise.
 
         """
-        dest = route_check.rm.dest
-        self.logger.warn("route_check to %s failed: %s", dest, error_reason)
+        dest = route_check.dest_str
+        self.logger.warning("route_check to %s failed: %s", dest, error_reason)
 
         context = moduleapi.ActionContext(self.name, dispatch,
-                "route_check: route to {!s} {:s}".format(dest, error_reason))
+                "route_check: route to {:s} {:s}".format(dest, error_reason))
 
         action_list = moduleapi.ActionList(self.logger, route_check.on_error)
         all_ok = action_list.run(context)
@@ -352,8 +375,10 @@ class FIBModuleAPI(moduleapi.ModuleAPI, metaclass=abc.ABCMeta):
         the route check. Returns a ModuleRunStatus.
 
         """
-        dest = route_check.rm.dest
-        self.logger.debug("checking route to %s", dest)
+        dest = route_check.dest_str
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            self.logger.debug("checking route to %s", dest)
 
         r = self.fib.get_route_to(route_check.rm)
 
@@ -363,28 +388,36 @@ class FIBModuleAPI(moduleapi.ModuleAPI, metaclass=abc.ABCMeta):
             ok = self._route_check_failed(dispatch, route_check, "not found")
             return MRS.check_failed if ok else MRS.action_error
 
-        self.logger.debug("route found, via %s", _nexthops_str(r.nexthops))
+        # computed at most once; needed for debug and for error messages
+        nh_str = None
+
+        if debug:
+            nh_str = _nexthops_str(r.nexthops)
+            self.logger.debug("route found, via %s", nh_str)
 
         if route_check.non_null:
             if r.is_null:
                 ok = self._route_check_failed(dispatch, route_check,
                         "{:s}, should be non-null".format(r.rt_type.name))
                 return MRS.check_failed if ok else MRS.action_error
-            else:
+            elif debug:
                 self.logger.debug("route to %s is non-null, as expected", dest)
 
         if route_check.nexthops_any:
-            for nh in r.nexthops:
-                if nh.gw in route_check.nexthops_any:
-                    self.logger.debug("route to %s via expected NH %s", dest, nh.gw)
-                    break
-            else:
-                error_reason = "via {:s}, not in [{:s}]".format(
-                        _nexthops_str(r.nexthops),
+            nexthops_any_set = route_check.nexthops_any_set
+            if nexthops_any_set.isdisjoint(nh.gw for nh in r.nexthops):
+                if nh_str is None:
+                    nh_str = _nexthops_str(r.nexthops)
+                error_reason = "via {:s}, not in [{:s}]".format(nh_str,
                         ', '.join(str(ip) for ip in route_check.nexthops_any))
                 ok = self._route_check_failed(dispatch, route_check, error_reason)
                 return MRS.check_failed if ok else MRS.action_error
 
+            if debug:
+                expected = next(nh.gw for nh in r.nexthops
+                        if nh.gw in nexthops_any_set)
+                self.logger.debug("route to %s via expected NH %s", dest, expected)
+
         self.logger.info("route_check to %s check satisfied", dest)
 
         return MRS.ok
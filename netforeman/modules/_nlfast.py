@@ -0,0 +1,279 @@
+#! /usr/bin/env python3
+
+# NetForeman - making sure your network is running smoothly
+# Copyright (C) 2016, 2017 Israel G. Lugo
+#
+# This file is part of NetForeman.
+#
+# NetForeman is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# NetForeman is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with NetForeman. If not, see <http://www.gnu.org/licenses/>.
+#
+# For suggestions, feedback or bug reports: israel.lugo@lugosys.com
+
+
+"""Fast rtnetlink route dumps.
+
+Dumps routes through a raw Netlink socket, parsing the messages directly
+with struct. This avoids pyroute2's generic message classes, which are
+very slow when dumping large routing tables. Only the attributes we need
+are parsed.
+
+"""
+
+import os
+import socket
+import struct
+
+
+NETLINK_ROUTE = 0
+
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+RTM_NEWROUTE = 24
+RTM_GETROUTE = 26
+
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+
+RTA_DST = 1
+RTA_OIF = 4
+RTA_GATEWAY = 5
+RTA_PRIORITY = 6
+RTA_MULTIPATH = 9
+RTA_TABLE = 15
+
+RT_TABLE_MAIN = 254
+
+# Not exported by the socket module; value from linux/asm-generic/socket.h
+SO_RCVBUFFORCE = getattr(socket, 'SO_RCVBUFFORCE', 33)
+
+# attributes we parse; any others are skipped without slicing
+_ROUTE_ATTRS = frozenset((RTA_DST, RTA_OIF, RTA_GATEWAY, RTA_PRIORITY,
+                          RTA_MULTIPATH, RTA_TABLE))
+_NEXTHOP_ATTRS = frozenset((RTA_GATEWAY,))
+
+_nlmsghdr = struct.Struct("=IHHII")     # len, type, flags, seq, pid
+_rtmsg = struct.Struct("=BBBBBBBBI")    # family, dst_len, src_len, tos,
+                                        # table, protocol, scope, type,
+                                        # flags
+_rtattr = struct.Struct("=HH")          # len, type
+_rtnexthop = struct.Struct("=HBBi")     # len, flags, hops, ifindex
+_u32 = struct.Struct("=I")
+_nlmsgerr = struct.Struct("=i")
+
+_RECV_SIZE = 1024 * 1024
+
+
+def _set_rcvbuf(sock, size):
+    """Try to set a socket's receive buffer size.
+
+    Tries SO_RCVBUFFORCE first, which ignores the system limit
+    (net.core.rmem_max) but requires CAP_NET_ADMIN, and falls back to
+    SO_RCVBUF, which the kernel clamps to that limit. Failure is not an
+    error; the default buffer size will be used.
+
+    """
+    for optname in (SO_RCVBUFFORCE, socket.SO_RCVBUF):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, optname, size)
+            return
+        except OSError:
+            pass
+
+
+def _align(n):
+    """Align a length to a 4 byte boundary, as Netlink requires."""
+    return (n + 3) & ~3
+
+
+def _parse_attrs(buf, offset, end, wanted):
+    """Parse a sequence of rtattr from buf[offset:end].
+
+    Returns a dict mapping attribute types to memoryview payloads. Only
+    attribute types in the wanted set are included.
+
+    """
+    attrs = {}
+    unpack_rtattr = _rtattr.unpack_from
+    hdrlen = _rtattr.size
+
+    while offset + hdrlen <= end:
+        rta_len, rta_type = unpack_rtattr(buf, offset)
+        if rta_len < hdrlen:
+            break
+        if rta_type in wanted:
+            attrs[rta_type] = buf[offset+hdrlen:offset+rta_len]
+        # inlined _align(), this is the innermost loop
+        offset += (rta_len + 3) & ~3
+
+    return attrs
+
+
+def _parse_multipath(data):
+    """Parse an RTA_MULTIPATH payload.
+
+    Returns a list of (gw, oif) tuples, where gw is the packed gateway
+    address (or None).
+
+    """
+    nexthops = []
+    offset = 0
+    end = len(data)
+    hdrlen = _rtnexthop.size
+
+    while offset + hdrlen <= end:
+        rtnh_len, _, _, ifindex = _rtnexthop.unpack_from(data, offset)
+        if rtnh_len < hdrlen:
+            break
+        attrs = _parse_attrs(data, offset + hdrlen, offset + rtnh_len,
+                             _NEXTHOP_ATTRS)
+        gw = attrs.get(RTA_GATEWAY)
+        nexthops.append((bytes(gw) if gw is not None else None, ifindex))
+        offset += _align(rtnh_len)
+
+    return nexthops
+
+
+def _parse_route(buf, offset, end, table):
+    """Parse an RTM_NEWROUTE message body from buf[offset:end].
+
+    Returns a (family, route) tuple, where route is as described in
+    dump_routes, or None if the route doesn't belong to the specified
+    table.
+
+    """
+    (family, dst_len, _, _, rtm_table, proto, _, rt_type,
+            _) = _rtmsg.unpack_from(buf, offset)
+
+    attrs = _parse_attrs(buf, offset + _rtmsg.size, end, _ROUTE_ATTRS)
+
+    # tables above 255 are only given in RTA_TABLE
+    table_attr = attrs.get(RTA_TABLE)
+    if table_attr is not None:
+        rtm_table = _u32.unpack_from(table_attr)[0]
+    if rtm_table != table:
+        return None
+
+    dst = attrs.get(RTA_DST)
+    dst = bytes(dst) if dst is not None and dst_len != 0 else None
+
+    mpath = attrs.get(RTA_MULTIPATH)
+    if mpath is not None:
+        nexthops = _parse_multipath(mpath)
+    else:
+        gw = attrs.get(RTA_GATEWAY)
+        oif = attrs.get(RTA_OIF)
+        nexthops = [(bytes(gw) if gw is not None else None,
+                     _u32.unpack_from(oif)[0] if oif is not None else None)]
+
+    metric = attrs.get(RTA_PRIORITY)
+    if metric is not None:
+        metric = _u32.unpack_from(metric)[0]
+
+    return (family, (dst_len, dst, nexthops, metric, proto, rt_type))
+
+
+def dump_routes(family, table=RT_TABLE_MAIN, rcvbuf=None):
+    """Dump the routes of a routing table from the kernel.
+
+    Returns an iterator over (dst_len, dst, nexthops, metric, proto,
+    rt_type) tuples. dst is the packed destination address, or None for
+    default routes. nexthops is a list of (gw, oif) tuples, where gw is
+    the packed gateway address or None, and oif is the output interface
+    index or None. metric is None if the route doesn't have one. proto and
+    rt_type are the raw Netlink protocol and route type numbers.
+
+    rcvbuf, if specified, is the receive buffer size to request for the
+    socket, going above net.core.rmem_max if we have CAP_NET_ADMIN.
+    Raises OSError in case of error.
+
+    """
+    return (r for _, r in _dump(family, table, rcvbuf))
+
+
+def dump_routes_by_family(table=RT_TABLE_MAIN, rcvbuf=None):
+    """Dump the routes of a routing table for all families at once.
+
+    Issues a single dump request. Returns a dict mapping each address
+    family to a list of route tuples, as described in dump_routes. Raises
+    OSError in case of error.
+
+    """
+    routes_by_family = {}
+
+    for family, r in _dump(socket.AF_UNSPEC, table, rcvbuf):
+        routes = routes_by_family.get(family)
+        if routes is not None:
+            routes.append(r)
+        else:
+            routes_by_family[family] = [r]
+
+    return routes_by_family
+
+
+def _dump(family, table, rcvbuf):
+    """Dump routes from the kernel.
+
+    Returns an iterator over (family, route) tuples, where route is as
+    described in dump_routes. family may be AF_UNSPEC, to dump all
+    families.
+
+    """
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+    try:
+        if rcvbuf is not None:
+            _set_rcvbuf(sock, rcvbuf)
+
+        sock.bind((0, 0))
+
+        seq = 1
+        body = _rtmsg.pack(family, 0, 0, 0, 0, 0, 0, 0, 0)
+        request = _nlmsghdr.pack(_nlmsghdr.size + len(body), RTM_GETROUTE,
+                                 NLM_F_REQUEST | NLM_F_DUMP, seq, 0) + body
+        sock.sendto(request, (0, 0))
+
+        hdrlen = _nlmsghdr.size
+        unpack_nlmsghdr = _nlmsghdr.unpack_from
+        parse_route = _parse_route
+
+        while True:
+            data = sock.recv(_RECV_SIZE)
+            buf = memoryview(data)
+            offset = 0
+            end = len(data)
+
+            while offset + hdrlen <= end:
+                (msg_len, msg_type, _, msg_seq,
+                        _) = unpack_nlmsghdr(buf, offset)
+                if msg_len < hdrlen:
+                    raise OSError("malformed Netlink message")
+
+                if msg_seq == seq:
+                    if msg_type == NLMSG_DONE:
+                        return
+                    elif msg_type == NLMSG_ERROR:
+                        error = -_nlmsgerr.unpack_from(buf, offset + hdrlen)[0]
+                        if error:
+                            raise OSError(error, os.strerror(error))
+                    elif msg_type == RTM_NEWROUTE:
+                        r = parse_route(buf, offset + hdrlen,
+                                        offset + msg_len, table)
+                        if r is not None:
+                            yield r
+
+                offset += _align(msg_len)
+    finally:
+        sock.close()
+
+
+# vim: set expandtab smarttab shiftwidth=4 softtabstop=4 tw=75 :
@@ -23,7 +23,9 @@
 
 """Email sending."""
 
-import smtplib
+import atexit
+import functools
+import socket
 import email.mime.text
 import email.utils
 
@@ -32,6 +34,34 @@ from netforeman import config
 from netforeman import moduleapi
 
 
+_USER_AGENT = 'NetForeman {:s}'.format(version.__version__)
+"""User-Agent header for our emails."""
+
+
+@functools.lru_cache(maxsize=1)
+def _get_msgid_domain():
+    """Get the domain for Message-ID headers.
+
+    make_msgid calls socket.getfqdn() for every message when not given a
+    domain, which may mean a DNS lookup each time. Look it up only once.
+
+    """
+    return socket.getfqdn()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_smtplib():
+    """Import and return the smtplib module.
+
+    smtplib pulls in ssl, which is slow to import. Importing it lazily
+    means runs that never send an email don't pay for it.
+
+    """
+    import smtplib
+
+    return smtplib
+
+
 class _Email(email.mime.text.MIMEText):
     def __init__(self, text, from_address, to_address, subject, date=None):
 
@@ -44,8 +74,8 @@ class _Email(email.mime.text.MIMEText):
             self['Date'] = email.utils.formatdate()
         else:
             self['Date'] = email.utils.formatdate(date)
-        self['Message-ID'] = email.utils.make_msgid('netforeman')
-        self['User-Agent'] = 'NetForeman {:s}'.format(version.__version__)
+        self['Message-ID'] = email.utils.make_msgid('netforeman', _get_msgid_domain())
+        self['User-Agent'] = _USER_AGENT
 
 
 class EmailSettings(config.Settings):
@@ -56,8 +86,13 @@ class EmailSettings(config.Settings):
 
     def __init__(self, from_address, to_address, server, port=_PORT,
             default_subject=_DEFAULT_SUBJECT, username=None,
-            password=None):
-        """Initialize an EmailSettings instance."""
+            password=None, batch=False):
+        """Initialize an EmailSettings instance.
+
+        If batch is True, emails are queued and only sent after all
+        modules have run, in a single SMTP session.
+
+        """
         super().__init__()
 
         self.from_address = from_address
@@ -72,6 +107,7 @@ class EmailSettings(config.Settings):
         self.default_subject = default_subject
         self.username = username
         self.password = password
+        self.batch = batch
 
     @classmethod
     def from_pyhocon(cls, conf, configurator):
@@ -88,9 +124,10 @@ class EmailSettings(config.Settings):
         default_subject = conf.get('default_subject', cls._DEFAULT_SUBJECT)
         username = cls._get_conf(conf, 'username', False)
         password = cls._get_conf(conf, 'password', False)
+        batch = conf.get_bool('batch', False)
 
         return cls(from_address, to_address, server, port, default_subject,
-                username, password)
+                username, password, batch)
 
 
 class ActionSendEmailSettings(moduleapi.ActionSettings):
@@ -158,9 +195,9 @@ class ActionSendEmail(moduleapi.Action):
         """
         self.module.logger.info("sending email, triggered by %s", context.calling_module)
 
-        text = self.settings.text.format(
-                module=str(context.calling_module),
-                message=str(context.message))
+        text = self.settings.text.format_map({
+                'module': str(context.calling_module),
+                'message': str(context.message)})
 
         subject = (self.settings.subject
                     if self.settings.subject is not None
@@ -168,9 +205,7 @@ class ActionSendEmail(moduleapi.Action):
 
         msg = _Email(text, self.module.settings.from_address, self.module.settings.to_address, subject)
 
-        sender = smtplib.SMTP(self.module.settings.server, self.module.settings.port)
-        sender.send_message(msg)
-        sender.quit()
+        self.module.send_message(msg)
 
 
 class EmailModuleAPI(moduleapi.ModuleAPI):
@@ -192,9 +227,94 @@ class EmailModuleAPI(moduleapi.ModuleAPI):
 
         self.settings = settings
 
+        # SMTP connection, kept open across messages; see _send_now
+        self._smtp = None
+        atexit.register(self.close)
+
+        # messages waiting for flush, if batching
+        self._outbox = []
+
         self.logger.debug("loaded, server %s, target %s",
                 self.settings.server, self.settings.to_address)
 
+    def send_message(self, msg):
+        """Send an email message.
+
+        If batching is enabled, the message is queued until flush is
+        called. Otherwise, it is sent immediately.
+
+        """
+        if self.settings.batch:
+            self._outbox.append(msg)
+        else:
+            self._send_now(msg)
+
+    def flush(self, dispatch):
+        """Send any queued messages, in a single SMTP session.
+
+        Returns a moduleapi.ModuleRunStatus.
+
+        """
+        status = moduleapi.ModuleRunStatus.ok
+
+        outbox, self._outbox = self._outbox, []
+        if not outbox:
+            return status
+
+        self.logger.info("sending %d queued email(s)", len(outbox))
+
+        for msg in outbox:
+            try:
+                self._send_now(msg)
+            except Exception as e:
+                self.logger.error("while sending queued email '%s': %s",
+                        msg['Subject'], e)
+                status = moduleapi.ModuleRunStatus.action_error
+
+        return status
+
+    def _send_now(self, msg):
+        """Send an email message immediately.
+
+        Reuses the SMTP connection from previous messages, if there is
+        one. If the server has meanwhile closed it, or answers 421 to
+        say it is closing it, reconnects once.
+
+        """
+        smtplib = _get_smtplib()
+
+        if self._smtp is not None:
+            try:
+                self._smtp.send_message(msg)
+                return
+            except smtplib.SMTPServerDisconnected:
+                # server dropped the idle connection; reconnect below
+                self.logger.debug("SMTP connection lost, reconnecting")
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code != 421:
+                    raise
+                # server is closing the idle session, e.g. "421 timeout"
+                self.logger.debug("SMTP server closing connection, reconnecting")
+
+            smtp, self._smtp = self._smtp, None
+            smtp.close()
+
+        self._smtp = smtplib.SMTP(self.settings.server, self.settings.port)
+        self._smtp.send_message(msg)
+
+    def close(self):
+        """Close the SMTP connection, if open."""
+
+        if self._smtp is None:
+            return
+
+        smtp, self._smtp = self._smtp, None
+        try:
+            smtp.quit()
+        except (_get_smtplib().SMTPException, OSError):
+            # already broken or closed; nothing else to do
+            smtp.close()
+
 
 API = EmailModuleAPI
 
@@ -25,18 +25,22 @@
 
 import socket
 import errno
+import sys
+import itertools
+import concurrent.futures
 import netaddr
 import pyroute2
 
 from netforeman import route
 from netforeman.modules import _fibinterface
+from netforeman.modules import _nlfast
 
 
 
 # Mapping of Netlink route types to route.RouteType. We use this so we
-# don't have to rely on RouteType values matching Netlink order. We can
-# change this to a dict if we ever need to.
-_nl_rttype_to_rttype = [
+# don't have to rely on RouteType values matching Netlink order. A tuple,
+# since it never changes; we can change this to a dict if we ever need to.
+_nl_rttype_to_rttype = (
     route.RouteType.unspec,
     route.RouteType.unicast,
     route.RouteType.local,
@@ -49,7 +53,38 @@ _nl_rttype_to_rttype = [
     route.RouteType.throw,
     route.RouteType.nat,
     route.RouteType.xresolve
-]
+)
+
+# Mapping of Netlink route protocol numbers to names. A list indexed by
+# the (8 bit) protocol number, which is faster than pyroute2's dict. Unknown
+# protocols have None; use _get_proto_name to raise KeyError for those.
+_rt_proto = [None] * 256
+for _num, _name in pyroute2.netlink.rtnl.rt_proto.items():
+    if isinstance(_num, int):
+        _rt_proto[_num] = sys.intern(_name)
+del _num, _name
+
+# Receive buffer size for the route dump sockets. Large enough to hold
+# big route dumps in few recv() calls.
+_NL_RCVBUF_SIZE = 16 * 1024 * 1024
+
+# Mapping of address families to netaddr IP versions.
+_family_to_version = {socket.AF_INET: 4, socket.AF_INET6: 6}
+
+
+def _dump_raw_routes(family):
+    """Dump the main table's routes for a family, on a new Netlink socket.
+
+    Returns a list of raw route tuples, as returned by
+    _nlfast.dump_routes. Each call uses its own socket, so dumps may
+    proceed in parallel from different threads. Raises
+    _fibinterface.FIBError in case of error.
+
+    """
+    try:
+        return list(_nlfast.dump_routes(family, rcvbuf=_NL_RCVBUF_SIZE))
+    except OSError as e:
+        raise _fibinterface.FIBError("unable to dump routes: {!s}".format(e), e)
 
 
 class LinuxFIBInterface(_fibinterface.FIBInterface):
@@ -58,11 +93,97 @@ class LinuxFIBInterface(_fibinterface.FIBInterface):
     def __init__(self):
         self.ipr = pyroute2.IPRoute()
 
+        # interface names by index, and indexes by name; filled in as
+        # interfaces are looked up, and replaced by each full link dump
+        self._ifnames = {}
+        self._ifindexes = {}
+
     def get_routes(self, family):
-        """Get routes from the underlying FIB."""
-        nl_routes = self.ipr.get_routes(family=family, table=254)
+        """Get routes from the underlying FIB.
+
+        Returns an iterator over the routes, which are created as they are
+        consumed.
+
+        """
+        return iter(self.get_route_array(family))
+
+    def get_route_array(self, family):
+        """Get routes from the underlying FIB, in compact form.
+
+        Returns a route.RouteArray. No netaddr or Route objects are
+        created until the routes are accessed.
+
+        """
+        raw_routes = _dump_raw_routes(family)
+
+        return self._route_array_from_raw(family, raw_routes,
+                                          self._build_ifname_cache())
+
+    def get_routes_both(self):
+        """Get both IPv4 and IPv6 routes from the underlying FIB.
+
+        The two families are dumped concurrently, each on its own Netlink
+        socket. Returns an iterator over the IPv4 routes, followed by the
+        IPv6 routes.
+
+        """
+        families = (socket.AF_INET, socket.AF_INET6)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(_dump_raw_routes, family)
+                       for family in families]
+
+            ifnames = self._build_ifname_cache()
+            raw_routes = [f.result() for f in futures]
+
+        return itertools.chain.from_iterable(
+                self._route_array_from_raw(family, raw, ifnames)
+                for family, raw in zip(families, raw_routes))
+
+    def get_all_routes(self):
+        """Get the routes of all families from the underlying FIB.
+
+        Fetches the routes in a single dump. Returns a dict mapping each
+        family (socket.AF_INET, socket.AF_INET6) to a route.RouteArray.
+        Raises _fibinterface.FIBError in case of error.
+
+        """
+        try:
+            raw_by_family = _nlfast.dump_routes_by_family(rcvbuf=_NL_RCVBUF_SIZE)
+        except OSError as e:
+            raise _fibinterface.FIBError("unable to dump routes: {!s}".format(e), e)
+
+        ifnames = self._build_ifname_cache()
+
+        return {family: self._route_array_from_raw(family,
+                                                   raw_by_family.get(family, []),
+                                                   ifnames)
+                for family in (socket.AF_INET, socket.AF_INET6)}
+
+    def _route_array_from_raw(self, family, raw_routes, ifnames):
+        """Create a route.RouteArray from raw route tuples.
+
+        raw_routes should be an iterable of tuples, as returned by
+        _nlfast.dump_routes. ifnames should be a dict as returned by
+        _build_ifname_cache.
+
+        """
+        routes = route.RouteArray(family)
+        guess_nh_type = self._guess_nh_type
+        lookup_ifname = self._lookup_ifname
+
+        for destlen, dest, raw_nexthops, metric, proto, rt_type in raw_routes:
+            nexthops = [
+                (gw, lookup_ifname(oif, ifnames) if oif is not None else None,
+                 guess_nh_type(gw))
+                for gw, oif in raw_nexthops
+            ]
 
-        return [self._route_from_rtnl_msg(msg) for msg in nl_routes]
+            routes.append(dest, destlen, nexthops, metric,
+                          _rt_proto[proto] or self._get_proto_name(proto),
+                          _nl_rttype_to_rttype[rt_type])
+
+        return routes
 
     def add_route(self, r):
         """Add a route to the FIB.
@@ -145,11 +266,13 @@ class LinuxFIBInterface(_fibinterface.FIBInterface):
         so on).
 
         """
-        nl_routes = self.ipr.get_routes(family=family, table=254)
+        # filter on the raw tuples, so only default routes are converted
+        raw_routes = [r for r in _dump_raw_routes(family) if r[0] == 0]
+        if not raw_routes:
+            return []
 
-        return [self._route_from_rtnl_msg(msg)
-                for msg in nl_routes
-                if msg['dst_len'] == 0]
+        return list(self._route_array_from_raw(family, raw_routes,
+                                               self._build_ifname_cache()))
 
     def matching_routes_to(self, dest):
         """Get the list of all routes matching the specified dest.
@@ -163,23 +286,36 @@ class LinuxFIBInterface(_fibinterface.FIBInterface):
         blackhole or unreachable IPv4 routes on Linux, as asking the kernel
         to resolve would result in an error.
 
-        """
-        nl_routes = self.ipr.get_routes(
-                family=route.Route.family_from_dest(dest),
-                table=254)
+        The routes are dumped anew on every call, so the result always
+        reflects the kernel's current table. Raises
+        _fibinterface.FIBError in case of error.
 
+        """
+        family = route.Route.family_from_dest(dest)
+        bits = 32 if family == socket.AF_INET else 128
+        value = dest.value
         destlen = dest.prefixlen
 
-        return sorted(
-            [self._route_from_rtnl_msg(msg)
-             for msg in nl_routes
-             if msg['dst_len'] == 0     # include default route, which has no RTA_DST
-                or (msg['dst_len'] <= destlen
-                    and dest
-                        in netaddr.IPNetwork("%s/%d" % (msg.get_attr('RTA_DST'), msg['dst_len'])))
-            ],
-            key=lambda r: r.destlen,    # sort by prefix length (specificity)
-            reverse=True)
+        # filter on the raw tuples, so only matching routes are converted
+        raw_routes = []
+        for raw in _dump_raw_routes(family):
+            rt_destlen = raw[0]
+            if rt_destlen == 0:
+                # default route, which has no RTA_DST
+                raw_routes.append(raw)
+            elif rt_destlen <= destlen:
+                rt_value = int.from_bytes(raw[1], 'big')
+                if (value ^ rt_value) >> (bits - rt_destlen) == 0:
+                    raw_routes.append(raw)
+
+        if not raw_routes:
+            return []
+
+        # sort by prefix length (specificity)
+        raw_routes.sort(key=lambda raw: raw[0], reverse=True)
+
+        return list(self._route_array_from_raw(family, raw_routes,
+                                               self._build_ifname_cache()))
 
     # TODO: Create a get_all_routes_to() method, that returns all routes to
     # a certain destination (or rm, not sure). Will be necessary for
@@ -244,16 +380,25 @@ class LinuxFIBInterface(_fibinterface.FIBInterface):
 
         return d
 
-    def _route_from_rtnl_msg(self, rtnl_msg):
-        """Create a Route from an rtnetlink message."""
+    def _route_from_rtnl_msg(self, rtnl_msg, ifnames=None):
+        """Create a Route from an rtnetlink message.
+
+        ifnames, if specified, should be a dict mapping interface indexes
+        to names, as returned by _build_ifname_cache. It is used to avoid
+        querying the kernel for each nexthop's interface.
+
+        """
 
         family = rtnl_msg['family']
         destlen = rtnl_msg['dst_len']
-        if destlen == 0:
-            dest = route.Route.default_network(family)
+        if destlen:
+            # build from the integer value, bypassing netaddr's CIDR parser
+            dest_packed = socket.inet_pton(family, rtnl_msg.get_attr('RTA_DST'))
+            dest = netaddr.IPNetwork((int.from_bytes(dest_packed, 'big'), destlen),
+                                     version=_family_to_version[family])
         else:
-            dest_str = "{:s}/{:d}".format(rtnl_msg.get_attr('RTA_DST'), destlen)
-            dest = netaddr.IPNetwork(dest_str)
+            # default route; no RTA_DST to look at
+            dest = route.Route.default_network(family)
 
         # make sure Netlink's idea of the protocol family equals our own
         assert family == route.Route.family_from_dest(dest)
@@ -262,37 +407,82 @@ class LinuxFIBInterface(_fibinterface.FIBInterface):
         # as separate, unrelated routes, which happen to have the same dst.
         nh_msgs = rtnl_msg.get_attr('RTA_MULTIPATH')
         if nh_msgs is not None:
-            nexthops = [self._nexthop_from_mpath_msg(msg, True) for msg in nh_msgs]
+            nexthops = [self._nexthop_from_rtmsg(msg, True, ifnames) for msg in nh_msgs]
         else:
-            nexthops = [self._nexthop_from_rtmsg(rtnl_msg, False)]
+            nexthops = [self._nexthop_from_rtmsg(rtnl_msg, False, ifnames)]
 
         # XXX: This seems to not exist on IPv4, will be None when family == AF_INET
         metric = rtnl_msg.get_attr('RTA_PRIORITY')
 
-        proto = self._get_proto_name(rtnl_msg['proto'])
+        # table lookups inlined for speed; _get_proto_name raises for unknown
+        # protocols
+        protonum = rtnl_msg['proto']
+        proto = _rt_proto[protonum] or self._get_proto_name(protonum)
 
-        rt_type = self._get_rt_type(rtnl_msg['type'])
+        rt_type = _nl_rttype_to_rttype[rtnl_msg['type']]
 
         return route.Route(dest, destlen, nexthops, metric, proto, rt_type)
 
-    def _nexthop_from_rtmsg(self, msg, mpath_fragment):
+    def _nexthop_from_rtmsg(self, msg, mpath_fragment, ifnames=None):
         """Create a NextHop from an rtnetlink message.
 
         mpath_fragment should be a boolean indicating whether msg is an
         RTA_MULTIPATH fragment or a full message. The parsing is done
-        differently.
+        differently. ifnames is as in _route_from_rtnl_msg.
 
         """
         gw_str = msg.get_attr('RTA_GATEWAY')
-        gw = netaddr.IPAddress(gw_str) if gw_str is not None else None
+        if gw_str is not None:
+            # build from the integer value, bypassing netaddr's parser
+            family = socket.AF_INET6 if ':' in gw_str else socket.AF_INET
+            gw_packed = socket.inet_pton(family, gw_str)
+            gw = netaddr.IPAddress(int.from_bytes(gw_packed, 'big'),
+                                   _family_to_version[family])
+        else:
+            gw = None
 
         oif_idx = msg['oif'] if mpath_fragment else msg.get_attr('RTA_OIF')
-        ifname = self._get_ifname(oif_idx) if oif_idx is not None else None
+        ifname = self._lookup_ifname(oif_idx, ifnames) if oif_idx is not None else None
 
         nh_type = self._guess_nh_type(gw)
 
         return route.NextHop(gw, ifname, nh_type)
 
+    def _build_ifname_cache(self):
+        """Get the names of all interfaces, in a single Netlink dump.
+
+        Returns a dict mapping interface indexes to their names. The names
+        are interned, so all routes share the same string objects, even
+        across different dumps. Also refreshes the interface caches used
+        by _lookup_ifname and _get_ifidx.
+
+        """
+        ifnames = {link['index']: sys.intern(link.get_attr('IFLA_IFNAME'))
+                   for link in self.ipr.get_links()}
+
+        self._ifnames = ifnames
+        self._ifindexes = {name: index for index, name in ifnames.items()}
+
+        return ifnames
+
+    def _lookup_ifname(self, index, ifnames=None):
+        """Get the name of an interface, preferably from a cache.
+
+        ifnames, if not None, should be a dict as returned by
+        _build_ifname_cache. Otherwise, the names from previous lookups are
+        used. If index is not found there (e.g. the interface was created
+        after the cache was built), the kernel is queried directly.
+
+        """
+        if ifnames is None:
+            ifnames = self._ifnames
+
+        ifname = ifnames.get(index)
+        if ifname is not None:
+            return ifname
+
+        return self._get_ifname(index)
+
     def _get_ifname(self, index):
         """Get the name of an interface.
 
@@ -301,12 +491,20 @@ class LinuxFIBInterface(_fibinterface.FIBInterface):
 
         """
         try:
-            iface = self.ipr.link("get", index=index)[0]
+            ifaces = self.ipr.link("get", index=index)
         except pyroute2.netlink.exceptions.NetlinkError as e:
             if e.code == errno.ENODEV:
                 return None
+            raise
+
+        if not ifaces:
+            return None
+
+        ifname = sys.intern(ifaces[0].get_attr('IFLA_IFNAME'))
+        self._ifnames[index] = ifname
+        self._ifindexes[ifname] = index
 
-        return iface.get_attr('IFLA_IFNAME')
+        return ifname
 
     def _get_ifidx(self, ifname):
         """Get the index of an interface.
@@ -315,9 +513,18 @@ class LinuxFIBInterface(_fibinterface.FIBInterface):
         if none exists.
 
         """
+        index = self._ifindexes.get(ifname)
+        if index is not None:
+            return index
+
         iflist = self.ipr.link_lookup(ifname=ifname)
+        if not iflist:
+            return None
+
+        index = iflist[0]
+        self._ifindexes[ifname] = index
 
-        return iflist[0] if iflist else None
+        return index
 
     @staticmethod
     def _guess_nh_type(gw):
@@ -331,17 +538,6 @@ class LinuxFIBInterface(_fibinterface.FIBInterface):
 
         return nh_type
 
-    @staticmethod
-    def _get_rt_type(typenum):
-        """Get the route.RouteType from a Netlink route type.
-
-        Raises a subclass of LookupError if typenum is unknown.
-
-        """
-        # we reserve the right to change this to a dict in the future;
-        # hence, we say we raise the base class of IndexError and KeyError
-        return _nl_rttype_to_rttype[typenum]
-
     @staticmethod
     def _get_proto_name(protonum):
         """Get the source protocol name from its number.
@@ -349,7 +545,11 @@ class LinuxFIBInterface(_fibinterface.FIBInterface):
         Raises KeyError if the protocol is unknown.
 
         """
-        return pyroute2.netlink.rtnl.rt_proto[protonum]
+        name = _rt_proto[protonum] if 0 <= protonum < len(_rt_proto) else None
+        if name is None:
+            raise KeyError(protonum)
+
+        return name
 
 
 
@@ -367,7 +367,7 @@ class ProcessModuleAPI(moduleapi.ModuleAPI):
 
         """
         basename = process_check.basename
-        self.logger.warn("process_check for %s failed: %s", basename, error_reason)
+        self.logger.warning("process_check for %s failed: %s", basename, error_reason)
 
         context = moduleapi.ActionContext(self.name, dispatch,
                 "process_check: process {!s}: {:s}".format(basename, error_reason))
@@ -25,11 +25,26 @@
 
 
 import socket
+import array
 import enum # Python 3.4 and above
 
 import netaddr
 
 
+_default_networks = {
+    socket.AF_INET: netaddr.IPNetwork("0.0.0.0/0"),
+    socket.AF_INET6: netaddr.IPNetwork("::/0"),
+}
+"""Default networks, by family. Only for comparisons; never handed out,
+since netaddr objects are mutable."""
+
+_version_to_family = {4: socket.AF_INET, 6: socket.AF_INET6}
+"""Address families, by IP version."""
+
+_family_to_version = {socket.AF_INET: 4, socket.AF_INET6: 6}
+"""IP versions, by address family."""
+
+
 # TODO: Create a dictionary of routes by dest, to quickly spot IPv6 multipath
 # routes, and store them in our own RouteTable object.
 
@@ -46,6 +61,8 @@ class NHType(enum.Enum):
 class NextHop:
     """Nexthop within a route."""
 
+    __slots__ = ('gw', 'ifname', 'nh_type')
+
     def __init__(self, gw, ifname, nh_type):
         """Initialize a NextHop instance."""
 
@@ -56,13 +73,10 @@ class NextHop:
     def __str__(self):
         """Convert to string."""
 
-        s = ""
-
-        if self.ifname is not None:
-            s = "dev {:s}".format(self.ifname)
+        s = "dev " + self.ifname if self.ifname is not None else ""
 
         if self.nh_type == NHType.via:
-            s = "via {:s} {:s}".format(str(self.gw), s)
+            s = "via " + str(self.gw) + " " + s
 
         return s
 
@@ -106,6 +120,10 @@ class Route:
     Can contain multiple nexthops (multipath route).
 
     """
+
+    __slots__ = ('family', 'dest', 'destlen', 'nexthops', 'metric', 'proto',
+                 'rt_type', 'is_default', 'multipath', 'is_null')
+
     def __init__(self, dest, destlen, nexthops, metric, proto, rt_type):
         """Initialize a Route instance."""
 
@@ -122,10 +140,8 @@ class Route:
         self.proto = proto
         self.rt_type = rt_type
 
-        if self.destlen == 0:
-            if ((self.family == socket.AF_INET and dest != netaddr.IPNetwork("0.0.0.0/0"))
-                    or (self.family == socket.AF_INET6 and dest != netaddr.IPNetwork("::/0"))):
-                raise ValueError("destlen == 0 and dest isn't a default route")
+        if destlen == 0 and dest != _default_networks[self.family]:
+            raise ValueError("destlen == 0 and dest isn't a default route")
 
         self.is_default = (destlen == 0)
         self.multipath = (len(nexthops) > 1)
@@ -160,18 +176,16 @@ class Route:
     def __str__(self):
         """Convert to a string."""
 
+        # plain concatenation; this is called for every route when dumping
+        # a table, and avoids parsing format specs each time
         s = str(self.dest) if not self.is_default else "default"
 
-        s = "{:s} ({:s})".format(s, self.rt_type.name)
-
         if self.multipath:
-            s = "{:s} proto {:s}".format(s, self.proto)
-            nh_str = ''.join([ "\n\tnexthop " + str(nh) for nh in self.nexthops ])
-            s += nh_str
+            return ''.join([s, " (", self.rt_type.name, ") proto ", self.proto]
+                           + [ "\n\tnexthop " + str(nh) for nh in self.nexthops ])
         else:
-            s = "{:s} {:s} proto {:s}".format(s, str(self.nexthops[0]), self.proto)
-
-        return s
+            return ''.join([s, " (", self.rt_type.name, ") ",
+                            str(self.nexthops[0]), " proto ", self.proto])
 
     @staticmethod
     def validate_family(family):
@@ -212,24 +226,139 @@ class Route:
         Returns an appropriate value for use in creating a Route object.
 
         """
-        assert dest.version in (4, 6)
+        # dest.version is a property; read it only once
+        family = _version_to_family.get(dest.version)
+        assert family is not None
 
-        return socket.AF_INET if dest.version == 4 else socket.AF_INET6
+        return family
 
     @classmethod
     def default_network(cls, family):
-        """Return the default network for the specified family."""
-        family = cls.validate_family(family)
+        """Return the default network for the specified family.
+
+        A new object is returned on each call, built from its integer
+        value rather than parsed from a string.
 
-        if family == socket.AF_INET:
-            return netaddr.IPNetwork("0.0.0.0/0")
+        """
+        version = _family_to_version[cls.validate_family(family)]
+
+        return netaddr.IPNetwork((0, 0), version=version)
+
+
+class RouteArray:
+    """Compact, column-oriented storage for routes of a single family.
+
+    Routes are kept as parallel arrays of packed addresses and plain
+    values, rather than as Route objects with their netaddr instances.
+    This takes much less memory for large tables. Route objects are only
+    created when an entry is accessed.
+
+    """
+
+    def __init__(self, family):
+        """Initialize an empty RouteArray for the specified family."""
+
+        self.family = Route.validate_family(family)
+        self._version = 4 if family == socket.AF_INET else 6
+        self._addrlen = 4 if family == socket.AF_INET else 16
+
+        # per route
+        self._dests = bytearray()
+        self._destlens = array.array('B')
+        self._metrics = array.array('q')        # -1 for None
+        self._protos = []
+        self._rt_types = []
+        # nexthops of route i are in [_nh_offsets[i], _nh_offsets[i+1])
+        self._nh_offsets = array.array('L', [0])
+
+        # per nexthop
+        self._nh_gws = bytearray()
+        self._nh_has_gw = array.array('B')
+        self._nh_ifnames = []
+        self._nh_types = []
+
+    def __len__(self):
+        """Return the number of routes."""
+        return len(self._destlens)
+
+    def __getitem__(self, i):
+        """Get the i-th route, as a Route object."""
+        return self.to_route(i)
+
+    def __iter__(self):
+        """Return an iterator over the routes, as Route objects."""
+        return (self.to_route(i) for i in range(len(self)))
+
+    def append(self, dest, destlen, nexthops, metric, proto, rt_type):
+        """Append a route, from its raw components.
+
+        dest should be the packed destination address (in network byte
+        order), or None for a default route. nexthops should be a list of
+        (gw, ifname, nh_type) tuples, where gw is a packed address or None.
+        metric may be None. proto should be a str, and rt_type a
+        RouteType.
+
+        """
+        addrlen = self._addrlen
+        zero = bytes(addrlen)
+
+        if dest is None:
+            dest = zero
+        elif len(dest) != addrlen:
+            raise ValueError("dest has wrong length for family")
+
+        self._dests += dest
+        self._destlens.append(destlen)
+        self._metrics.append(metric if metric is not None else -1)
+        self._protos.append(proto)
+        self._rt_types.append(rt_type)
+
+        for gw, ifname, nh_type in nexthops:
+            self._nh_gws += gw if gw is not None else zero
+            self._nh_has_gw.append(gw is not None)
+            self._nh_ifnames.append(ifname)
+            self._nh_types.append(nh_type)
+
+        self._nh_offsets.append(len(self._nh_types))
+
+    def _addr_int(self, buf, i):
+        """Get the i-th packed address from buf, as an int."""
+        addrlen = self._addrlen
+        return int.from_bytes(buf[i*addrlen:(i+1)*addrlen], 'big')
+
+    def to_route(self, i):
+        """Create a Route object for the i-th route."""
+
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("route index out of range")
+
+        destlen = self._destlens[i]
+        if destlen == 0:
+            dest = Route.default_network(self.family)
         else:
-            return netaddr.IPNetwork("::/0")
+            dest = netaddr.IPNetwork((self._addr_int(self._dests, i), destlen),
+                                     version=self._version)
+
+        nexthops = [
+            NextHop(netaddr.IPAddress(self._addr_int(self._nh_gws, j), self._version)
+                        if self._nh_has_gw[j] else None,
+                    self._nh_ifnames[j], self._nh_types[j])
+            for j in range(self._nh_offsets[i], self._nh_offsets[i+1])
+        ]
+
+        metric = self._metrics[i]
+
+        return Route(dest, destlen, nexthops, metric if metric != -1 else None,
+                     self._protos[i], self._rt_types[i])
 
 
 class RouteMatch(Route):
     """Route subclass that accepts incomplete parameters, for matching."""
 
+    __slots__ = ()
+
     def __init__(self, family=None, dest=None, destlen=None, nexthops=None, metric=None, proto=None, rt_type=None):
         """Initialize a RouteMatch instance."""
 
@@ -254,10 +383,8 @@ class RouteMatch(Route):
                 raise ValueError("destlen ({:d}) doesn't match dest's prefix ({:d})".format(
                     destlen, prefixlen))
 
-            if destlen == 0:
-                if ((family == socket.AF_INET and dest != netaddr.IPNetwork("0.0.0.0/0"))
-                        or (family == socket.AF_INET6 and dest != netaddr.IPNetwork("::/0"))):
-                    raise ValueError("destlen == 0 and dest isn't a default route")
+            if destlen == 0 and dest != _default_networks[self.family]:
+                raise ValueError("destlen == 0 and dest isn't a default route")
 
         if nexthops is None:
             nexthops = []
@@ -32,6 +32,10 @@ import netaddr
 import netforeman.moduleapi
 
 
+_PKG_PREFIX = __package__ + "."
+"""Package prefix for FIB modules."""
+
+
 class TCAM:
     """Ternary Content-Addressable Memory.
 
@@ -132,16 +136,19 @@ class TCAM:
         maxlen = getattr(dest, 'prefixlen', bits)
         assert maxlen <= bits
 
-        # get the IP from dest (if it's a network), or dest itself
+        # get the IP from dest (if it's a network), or dest itself, as an
+        # int; networks are truncated by masking, not by parsing strings
         ip = getattr(dest, 'ip', dest)
-        ip_str = str(ip)
+        value = ip.value
+        version = dest.version
 
         interesting_lens = filter(lambda x: x <= maxlen, self.dests_by_len)
 
         r = None
         for destlen in sorted(interesting_lens, reverse=True):
-            truncated = netaddr.IPNetwork("{:s}/{:d}".format(ip_str, destlen),
-                                          flags=netaddr.NOHOST)
+            shift = bits - destlen
+            truncated = netaddr.IPNetwork(((value >> shift) << shift, destlen),
+                                          version=version)
             r = self.dests_by_len[destlen].get(truncated, None)
             if r is not None:
                 break
@@ -154,7 +161,8 @@ class RoutingTable:
         """Initialize a RoutingTable.
 
         Changes the routes *in place*, to aggregate nexthops to the same
-        path.
+        path. The routes are kept sorted from most specific (longest) to
+        least specific, and by metric within the same prefix length.
 
         """
         self.tcam = TCAM()
@@ -170,11 +178,25 @@ class RoutingTable:
                 else:
                     r_.add_nexthops(r.nexthops)
 
+            self.routes.sort(key=lambda r: (-r.destlen, r.metric or 0))
+
     def __iter__(self):
-        """Return an iterator over the routes."""
+        """Return an iterator over the routes.
 
+        Routes are returned from most specific to least specific.
+
+        """
         return self.routes.__iter__()
 
+    def find_exact(self, dest):
+        """Get the route for exactly the specified destination.
+
+        dest must be a netaddr.IPNetwork. Returns a Route object, or None
+        if none exists.
+
+        """
+        return self.tcam.get_exact(dest)
+
     def get_route_for(self, dest):
         """Get longest matching route for an address or network.
 
@@ -215,7 +237,7 @@ class RoutingTableModuleAPI(netforeman.moduleapi.ModuleAPI):
     @staticmethod
     def _load_fib_module(name):
         """Load a FIB module."""
-        return importlib.import_module("{:s}.{:s}".format(__package__, name))
+        return importlib.import_module(_PKG_PREFIX + name)
 
 
 